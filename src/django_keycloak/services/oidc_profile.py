@@ -1,6 +1,11 @@
+from collections import OrderedDict
 from datetime import timedelta
 
+import copy
+import hashlib
 import logging
+import threading
+import time
 
 from django.apps import apps as django_apps
 from django.conf import settings
@@ -19,6 +24,17 @@ import django_keycloak.services.realm
 
 logger = logging.getLogger(__name__)
 
+# Decoded id tokens, keyed on the client, the raw token and the data it was
+# validated against. Entries are only used until the token expires, so the
+# signature isn't verified over and over again for a token which is
+# presented more than once. The oldest entry is evicted when full.
+_decoded_id_tokens = OrderedDict()
+_decoded_id_tokens_lock = threading.Lock()
+_DECODED_ID_TOKENS_MAX_SIZE = 256
+
+# Resolved KEYCLOAK_REMOTE_USER_MODEL classes, keyed on the dotted path.
+_remote_user_models = {}
+
 
 def get_openid_connect_profile_model():
     """
@@ -45,13 +61,20 @@ def get_remote_user_model():
         # By default return the standard KeycloakRemoteUser model
         return KeycloakRemoteUser
 
+    path = settings.KEYCLOAK_REMOTE_USER_MODEL
+    if path in _remote_user_models:
+        return _remote_user_models[path]
+
     try:
-        return import_string(settings.KEYCLOAK_REMOTE_USER_MODEL)
+        UserModel = import_string(path)
     except ImportError:
         raise ImproperlyConfigured(
             "KEYCLOAK_REMOTE_USER_MODEL refers to non-existing class"
         )
 
+    _remote_user_models[path] = UserModel
+    return UserModel
+
 
 def get_or_create_from_id_token(client, id_token):
     """
@@ -61,18 +84,61 @@ def get_or_create_from_id_token(client, id_token):
     :param str id_token:
     :rtype: django_keycloak.models.OpenIdConnectProfile
     """
+    id_token_object = _decode_id_token(client=client, id_token=id_token)
+
+    return update_or_create_user_and_oidc_profile(
+        client=client, id_token_object=id_token_object)
+
+
+def _decode_id_token(client, id_token):
+    """
+    Decode and validate the given id_token. The result is cached until the
+    token expires, failures are never cached.
+
+    The cache key includes the client id (audience), realm certificates,
+    issuer and algorithms, so a changed client id, refreshed certificates or
+    refreshed well-known data invalidate cached tokens.
+
+    :param django_keycloak.models.Client client:
+    :param str id_token:
+    :rtype: dict
+    """
     issuer = django_keycloak.services.realm.get_issuer(client.realm)
+    algorithms = client.openid_api_client.well_known[
+        'id_token_signing_alg_values_supported']
+
+    cache_key = (
+        client.pk,
+        client.client_id,
+        id_token,
+        issuer,
+        tuple(algorithms),
+        hashlib.sha256(client.realm._certs.encode('utf-8')).hexdigest()
+    )
+    with _decoded_id_tokens_lock:
+        cached = _decoded_id_tokens.get(cache_key)
+        if cached is not None and cached['exp'] <= time.time():
+            del _decoded_id_tokens[cache_key]
+            cached = None
+    if cached is not None:
+        return copy.deepcopy(cached)
 
     id_token_object = client.openid_api_client.decode_token(
         token=id_token,
         key=client.realm.certs,
-        algorithms=client.openid_api_client.well_known[
-            'id_token_signing_alg_values_supported'],
+        algorithms=algorithms,
         issuer=issuer
     )
 
-    return update_or_create_user_and_oidc_profile(
-        client=client, id_token_object=id_token_object)
+    if 'exp' in id_token_object:
+        cached = copy.deepcopy(id_token_object)
+        with _decoded_id_tokens_lock:
+            if cache_key not in _decoded_id_tokens and \
+                    len(_decoded_id_tokens) >= _DECODED_ID_TOKENS_MAX_SIZE:
+                _decoded_id_tokens.popitem(last=False)
+            _decoded_id_tokens[cache_key] = cached
+
+    return id_token_object
 
 
 def update_or_create_user_and_oidc_profile(client, id_token_object):
@@ -1,4 +1,11 @@
-import mock
+import sys
+
+# Before Python 3.6 the standard library mock lags behind the backport
+# (e.g. no assert_not_called on 3.4), so use the backport there.
+if sys.version_info >= (3, 6):
+    from unittest import mock
+else:
+    import mock
 
 
 class MockTestCaseMixin(object):
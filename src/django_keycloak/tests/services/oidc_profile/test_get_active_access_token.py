@@ -1,5 +1,3 @@
-import mock
-
 from datetime import datetime
 
 from django.test import TestCase
@@ -7,7 +5,7 @@ from freezegun import freeze_time
 from keycloak.openid_connect import KeycloakOpenidConnect
 
 from django_keycloak.factories import OpenIdConnectProfileFactory
-from django_keycloak.tests.mixins import MockTestCaseMixin
+from django_keycloak.tests.mixins import MockTestCaseMixin, mock
 
 import django_keycloak.services.oidc_profile
 
@@ -1,36 +1,55 @@
-import mock
-
 from datetime import datetime
 
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from freezegun import freeze_time
+from jose.exceptions import JWTError
 from keycloak.openid_connect import KeycloakOpenidConnect
 
 from django_keycloak.factories import ClientFactory, \
     OpenIdConnectProfileFactory, UserFactory
-from django_keycloak.tests.mixins import MockTestCaseMixin
+from django_keycloak.tests.mixins import MockTestCaseMixin, mock
 
 import django_keycloak.services.oidc_profile
 
+_EXPIRED_AT = datetime(2018, 3, 5, 1, 0, 0)
+
+_DEFAULT_ID_TOKEN_PAYLOAD = {
+    'sub': 'some-sub',
+    'email': 'test@example.com',
+    'given_name': 'Some given name',
+    'family_name': 'Some family name'
+}
+
+_EXPECTED_DECODE_KWARGS = {
+    'token': 'some-id-token',
+    'key': {},
+    'algorithms': ['signing-alg'],
+    'issuer': 'https://issuer'
+}
+
 
 class ServicesOpenIDProfileGetOrCreateFromIdTokenTestCase(
         MockTestCaseMixin, TestCase):
 
-    def setUp(self):
-        self.client = ClientFactory(
+    @classmethod
+    def setUpTestData(cls):
+        cls.client_template = ClientFactory(
             realm___certs='{}',
             realm___well_known_oidc='{"issuer": "https://issuer"}'
         )
+
+    def setUp(self):
+        self.client = self.client_template
+        django_keycloak.services.oidc_profile._decoded_id_tokens.clear()
+        self.addCleanup(
+            django_keycloak.services.oidc_profile._decoded_id_tokens.clear)
         self.client.openid_api_client = mock.MagicMock(
             spec_set=KeycloakOpenidConnect)
         self.client.openid_api_client.well_known = {
             'id_token_signing_alg_values_supported': ['signing-alg']
         }
-        self.client.openid_api_client.decode_token.return_value = {
-            'sub': 'some-sub',
-            'email': 'test@example.com',
-            'given_name': 'Some given name',
-            'family_name': 'Some family name'
-        }
+        self.client.openid_api_client.decode_token.return_value = dict(
+            _DEFAULT_ID_TOKEN_PAYLOAD)
 
     def test_create_with_new_user_new_profile(self):
         """
@@ -44,12 +63,8 @@ class ServicesOpenIDProfileGetOrCreateFromIdTokenTestCase(
                 client=self.client, id_token='some-id-token'
             )
 
-        self.client.openid_api_client.decode_token.assert_called_with(
-            token='some-id-token',
-            key=dict(),
-            algorithms=['signing-alg'],
-            issuer='https://issuer'
-        )
+        self.client.openid_api_client.decode_token.assert_called_once_with(
+            **_EXPECTED_DECODE_KWARGS)
 
         self.assertEqual(profile.sub, 'some-sub')
         self.assertEqual(profile.user.username, 'some-sub')
@@ -66,22 +81,24 @@ class ServicesOpenIDProfileGetOrCreateFromIdTokenTestCase(
         """
         existing_profile = OpenIdConnectProfileFactory(
             access_token='access-token',
-            expires_before=datetime(2018, 3, 5, 1, 0, 0),
+            expires_before=_EXPIRED_AT,
             refresh_token='refresh-token',
             sub='some-sub'
         )
 
-        profile = django_keycloak.services.oidc_profile. \
-            get_or_create_from_id_token(
-                client=self.client, id_token='some-id-token'
-            )
+        # Select + insert user, select + update profile: 4 queries, plus 4
+        # savepoint/release pairs (outer atomic block, both update_or_create
+        # calls and the nested one around the insert). No query for
+        # profile.user.
+        with self.assertNumQueries(12):
+            profile = django_keycloak.services.oidc_profile. \
+                get_or_create_from_id_token(
+                    client=self.client, id_token='some-id-token'
+                )
+            self.assertEqual(profile.user.username, 'some-sub')
 
-        self.client.openid_api_client.decode_token.assert_called_with(
-            token='some-id-token',
-            key=dict(),
-            algorithms=['signing-alg'],
-            issuer='https://issuer'
-        )
+        self.client.openid_api_client.decode_token.assert_called_once_with(
+            **_EXPECTED_DECODE_KWARGS)
 
         self.assertEqual(profile.sub, 'some-sub')
         self.assertEqual(profile.pk, existing_profile.pk)
@@ -100,17 +117,19 @@ class ServicesOpenIDProfileGetOrCreateFromIdTokenTestCase(
             username='some-sub'
         )
 
-        profile = django_keycloak.services.oidc_profile.\
-            get_or_create_from_id_token(
-                client=self.client, id_token='some-id-token'
-            )
+        # Select + update user, select + insert profile: 4 queries, plus 4
+        # savepoint/release pairs (outer atomic block, both update_or_create
+        # calls and the nested one around the insert). No query for
+        # profile.user.
+        with self.assertNumQueries(12):
+            profile = django_keycloak.services.oidc_profile.\
+                get_or_create_from_id_token(
+                    client=self.client, id_token='some-id-token'
+                )
+            self.assertEqual(profile.user.username, 'some-sub')
 
-        self.client.openid_api_client.decode_token.assert_called_with(
-            token='some-id-token',
-            key=dict(),
-            algorithms=['signing-alg'],
-            issuer='https://issuer'
-        )
+        self.client.openid_api_client.decode_token.assert_called_once_with(
+            **_EXPECTED_DECODE_KWARGS)
 
         self.assertEqual(profile.sub, 'some-sub')
         self.assertEqual(profile.user.pk, existing_user.pk)
@@ -132,22 +151,23 @@ class ServicesOpenIDProfileGetOrCreateFromIdTokenTestCase(
 
         existing_profile = OpenIdConnectProfileFactory(
             access_token='access-token',
-            expires_before=datetime(2018, 3, 5, 1, 0, 0),
+            expires_before=_EXPIRED_AT,
             refresh_token='refresh-token',
             sub='some-sub'
         )
 
-        profile = django_keycloak.services.oidc_profile.\
-            get_or_create_from_id_token(
-                client=self.client, id_token='some-id-token'
-            )
+        # Select + update user, select + update profile: 4 queries, plus 3
+        # savepoint/release pairs (outer atomic block and both
+        # update_or_create calls). No query for profile.user.
+        with self.assertNumQueries(10):
+            profile = django_keycloak.services.oidc_profile.\
+                get_or_create_from_id_token(
+                    client=self.client, id_token='some-id-token'
+                )
+            self.assertEqual(profile.user.username, 'some-sub')
 
-        self.client.openid_api_client.decode_token.assert_called_with(
-            token='some-id-token',
-            key=dict(),
-            algorithms=['signing-alg'],
-            issuer='https://issuer'
-        )
+        self.client.openid_api_client.decode_token.assert_called_once_with(
+            **_EXPECTED_DECODE_KWARGS)
 
         self.assertEqual(profile.pk, existing_profile.pk)
         self.assertEqual(profile.sub, 'some-sub')
@@ -156,3 +176,177 @@ class ServicesOpenIDProfileGetOrCreateFromIdTokenTestCase(
         self.assertEqual(profile.user.email, 'test@example.com')
         self.assertEqual(profile.user.first_name, 'Some given name')
         self.assertEqual(profile.user.last_name, 'Some family name')
+
+
+class ServicesOpenIDProfileGetOrCreateFromIdTokenDecodeTestCase(
+        MockTestCaseMixin, SimpleTestCase):
+    """
+    Covers the token decoding part of get_or_create_from_id_token without
+    touching the database; user and profile storage is mocked out.
+    """
+
+    def setUp(self):
+        self.client = ClientFactory.build(
+            realm___certs='{}',
+            realm___well_known_oidc='{"issuer": "https://issuer"}',
+            realm__server__internal_url=''
+        )
+        django_keycloak.services.oidc_profile._decoded_id_tokens.clear()
+        self.addCleanup(
+            django_keycloak.services.oidc_profile._decoded_id_tokens.clear)
+        self.client.openid_api_client = mock.MagicMock(
+            spec_set=KeycloakOpenidConnect)
+        self.client.openid_api_client.well_known = {
+            'id_token_signing_alg_values_supported': ['signing-alg']
+        }
+        self.client.openid_api_client.decode_token.return_value = dict(
+            _DEFAULT_ID_TOKEN_PAYLOAD)
+
+        self.mocked_update_or_create = self.setup_mock(
+            'django_keycloak.services.oidc_profile'
+            '.update_or_create_user_and_oidc_profile'
+        )
+
+    def test_decoded_token_is_passed_on(self):
+        """
+        Case: oidc profile is requested based on a provided id token.
+        Expected: the id token is decoded and validated against the realm
+        certificates and issuer, the decoded token is used to update or create
+        the user and profile.
+        """
+        profile = django_keycloak.services.oidc_profile. \
+            get_or_create_from_id_token(
+                client=self.client, id_token='some-id-token'
+            )
+
+        self.client.openid_api_client.decode_token.assert_called_once_with(
+            **_EXPECTED_DECODE_KWARGS)
+        self.mocked_update_or_create.assert_called_once_with(
+            client=self.client, id_token_object=_DEFAULT_ID_TOKEN_PAYLOAD)
+        self.assertEqual(profile, self.mocked_update_or_create.return_value)
+
+    @freeze_time('2018-03-01 00:00:00')
+    def test_decoded_token_is_cached_until_expired(self):
+        """
+        Case: oidc profile is requested twice based on the same id token.
+        Expected: the id token is decoded only once, until it expires.
+        """
+        self.client.openid_api_client.decode_token.return_value = dict(
+            _DEFAULT_ID_TOKEN_PAYLOAD,
+            exp=1519862460  # 2018-03-01 00:01:00
+        )
+
+        for _ in range(2):
+            django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+                client=self.client, id_token='some-id-token'
+            )
+
+        self.assertEqual(
+            self.client.openid_api_client.decode_token.call_count, 1)
+        self.mocked_update_or_create.assert_called_with(
+            client=self.client,
+            id_token_object=dict(_DEFAULT_ID_TOKEN_PAYLOAD, exp=1519862460)
+        )
+
+        with freeze_time('2018-03-01 00:01:00'):
+            django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+                client=self.client, id_token='some-id-token'
+            )
+
+        self.assertEqual(
+            self.client.openid_api_client.decode_token.call_count, 2)
+
+    @freeze_time('2018-03-01 00:00:00')
+    def test_cached_token_is_not_shared(self):
+        """
+        Case: the caller modifies a decoded id token which got cached.
+        Expected: the next request for the same id token is not affected.
+        """
+        self.client.openid_api_client.decode_token.return_value = dict(
+            _DEFAULT_ID_TOKEN_PAYLOAD,
+            exp=1519862460  # 2018-03-01 00:01:00
+        )
+
+        for _ in range(2):
+            django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+                client=self.client, id_token='some-id-token'
+            )
+            id_token_object = \
+                self.mocked_update_or_create.call_args[1]['id_token_object']
+            self.assertEqual(id_token_object['sub'], 'some-sub')
+            id_token_object['sub'] = 'other-sub'
+
+    @freeze_time('2018-03-01 00:00:00')
+    def test_refreshed_certs_invalidate_cache(self):
+        """
+        Case: the realm certificates get refreshed after an id token was
+        decoded.
+        Expected: the id token is validated again against the new
+        certificates.
+        """
+        self.client.openid_api_client.decode_token.return_value = dict(
+            _DEFAULT_ID_TOKEN_PAYLOAD,
+            exp=1519862460  # 2018-03-01 00:01:00
+        )
+
+        django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+            client=self.client, id_token='some-id-token'
+        )
+
+        self.client.realm.certs = {'keys': [{'kid': 'new-key'}]}
+
+        django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+            client=self.client, id_token='some-id-token'
+        )
+
+        self.assertEqual(
+            self.client.openid_api_client.decode_token.call_count, 2)
+        self.client.openid_api_client.decode_token.assert_called_with(
+            **dict(_EXPECTED_DECODE_KWARGS,
+                   key={'keys': [{'kid': 'new-key'}]})
+        )
+
+    @freeze_time('2018-03-01 00:00:00')
+    def test_changed_client_id_invalidates_cache(self):
+        """
+        Case: the client id (the expected audience) changes after an id token
+        was decoded.
+        Expected: the id token is validated again.
+        """
+        self.client.openid_api_client.decode_token.return_value = dict(
+            _DEFAULT_ID_TOKEN_PAYLOAD,
+            exp=1519862460  # 2018-03-01 00:01:00
+        )
+
+        django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+            client=self.client, id_token='some-id-token'
+        )
+
+        self.client.client_id = 'other-client-id'
+
+        django_keycloak.services.oidc_profile.get_or_create_from_id_token(
+            client=self.client, id_token='some-id-token'
+        )
+
+        self.assertEqual(
+            self.client.openid_api_client.decode_token.call_count, 2)
+
+    def test_failed_decode_is_not_cached(self):
+        """
+        Case: decoding the id token fails.
+        Expected: the error is raised and the token is decoded again on the
+        next request.
+        """
+        self.client.openid_api_client.decode_token.side_effect = \
+            JWTError('invalid')
+
+        for _ in range(2):
+            with self.assertRaises(JWTError):
+                django_keycloak.services.oidc_profile.\
+                    get_or_create_from_id_token(
+                        client=self.client, id_token='some-id-token'
+                    )
+
+        self.assertEqual(
+            self.client.openid_api_client.decode_token.call_count, 2)
+        self.mocked_update_or_create.assert_not_called()
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.utils.module_loading import import_string
+
+from django_keycloak.remote_user import KeycloakRemoteUser
+from django_keycloak.tests.mixins import MockTestCaseMixin
+
+import django_keycloak.services.oidc_profile
+
+
+class ServicesOpenIDProfileGetRemoteUserModelTestCase(
+        MockTestCaseMixin, SimpleTestCase):
+
+    def setUp(self):
+        django_keycloak.services.oidc_profile._remote_user_models.clear()
+        self.mocked_import_string = self.setup_mock(
+            'django_keycloak.services.oidc_profile.import_string',
+            side_effect=import_string
+        )
+
+    def test_import_once(self):
+        """
+        Case: the remote user model is requested multiple times.
+        Expected: the configured class is imported only once.
+        """
+        for _ in range(2):
+            UserModel = django_keycloak.services.oidc_profile.\
+                get_remote_user_model()
+
+        self.assertIs(UserModel, KeycloakRemoteUser)
+        self.mocked_import_string.assert_called_once_with(
+            'django_keycloak.remote_user.KeycloakRemoteUser')
+
+    def test_changed_setting(self):
+        """
+        Case: the setting changes after the remote user model was resolved.
+        Expected: the class configured in the new setting is returned.
+        """
+        django_keycloak.services.oidc_profile.get_remote_user_model()
+
+        with override_settings(
+                KEYCLOAK_REMOTE_USER_MODEL='django.contrib.auth.models.'
+                                           'AnonymousUser'):
+            UserModel = django_keycloak.services.oidc_profile.\
+                get_remote_user_model()
+
+        self.assertIs(UserModel, AnonymousUser)
+        self.mocked_import_string.assert_called_with(
+            'django.contrib.auth.models.AnonymousUser')
+        self.assertEqual(self.mocked_import_string.call_count, 2)
+
+    @override_settings(KEYCLOAK_REMOTE_USER_MODEL='some.non.Existing')
+    def test_non_existing_class(self):
+        """
+        Case: the setting refers to a class which doesn't exist.
+        Expected: ImproperlyConfigured is raised.
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            django_keycloak.services.oidc_profile.get_remote_user_model()
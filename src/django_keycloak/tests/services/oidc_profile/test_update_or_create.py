@@ -1,5 +1,3 @@
-import mock
-
 from datetime import datetime
 
 from django.contrib.auth import get_user_model
@@ -9,7 +7,7 @@ from keycloak.openid_connect import KeycloakOpenidConnect
 
 from django_keycloak.factories import ClientFactory
 from django_keycloak.models import OpenIdConnectProfile
-from django_keycloak.tests.mixins import MockTestCaseMixin
+from django_keycloak.tests.mixins import MockTestCaseMixin, mock
 
 import django_keycloak.services.oidc_profile
 
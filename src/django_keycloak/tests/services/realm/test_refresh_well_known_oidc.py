@@ -1,9 +1,7 @@
-import mock
-
 from django.test import TestCase
 
 from django_keycloak.factories import RealmFactory
-from django_keycloak.tests.mixins import MockTestCaseMixin
+from django_keycloak.tests.mixins import MockTestCaseMixin, mock
 
 import django_keycloak.services.realm
 